@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""Time bin/rpm-s3 publishing to synthetic repositories.
+
+For each SIZE, SIZE+1 synthetic rpms with FILES files each are built with
+rpmbuild (and kept in --rpmdir for the next runs). SIZE of them are
+published to an empty repository in a filesystem-backed bucket
+(`--host file://...`, no S3 needed), then the last one is added to that
+repository, which is what most publishes do. The wall time, peak RSS of
+the rpm-s3 process, bytes transferred and time spent per phase
+(`--timings`) of both steps are printed and, with --results, appended
+to a json lines file along with the git version, so runs of different
+versions can be compared:
+
+    python bench/publish.py [-f FILES] [--results FILE] [SIZE...] [-- RPM-S3 OPTIONS]
+
+Needs the same environment as bin/rpm-s3, plus rpmbuild.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import optparse
+import subprocess
+
+lib_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RPM_S3 = os.path.join(lib_root, 'bin', 'rpm-s3')
+
+SPEC_HEADER = """\
+Name: synthetic
+Version: 1.0
+Release: 1
+Summary: Synthetic packages for bench/publish.py
+License: MIT
+BuildArch: noarch
+
+%%description
+Synthetic packages for bench/publish.py
+
+%%install
+for pkg in $(seq -f '%%%%06g' 0 %(last)d); do
+  mkdir -p %%{buildroot}/usr/share/synthetic-$pkg
+  for file in $(seq 1 %(files)d); do
+    echo synthetic-$pkg > %%{buildroot}/usr/share/synthetic-$pkg/file-$file
+  done
+done
+"""
+
+SPEC_PACKAGE = """
+%%package -n synthetic-%(num)06d
+Summary: Synthetic package %(num)d
+
+%%description -n synthetic-%(num)06d
+Synthetic package %(num)d
+
+%%files -n synthetic-%(num)06d
+/usr/share/synthetic-%(num)06d
+"""
+
+
+def build_rpms(rpmdir, count, files):
+    """Build count synthetic rpms, or reuse those of an earlier run."""
+    destdir = os.path.join(rpmdir, '%d-%d' % (count, files))
+    rpms = [os.path.join(destdir, 'synthetic-%06d-1.0-1.noarch.rpm' % num)
+            for num in range(count)]
+    if all(os.path.exists(rpm) for rpm in rpms):
+        return rpms
+
+    topdir = tempfile.mkdtemp()
+    try:
+        spec = os.path.join(topdir, 'synthetic.spec')
+        f = open(spec, 'w')
+        f.write(SPEC_HEADER % {'last': count - 1, 'files': files})
+        for num in range(count):
+            f.write(SPEC_PACKAGE % {'num': num})
+        f.close()
+        # the same rpms on every machine, as far as rpmbuild allows
+        env = dict(os.environ, SOURCE_DATE_EPOCH='1416466059')
+        subprocess.check_call(
+            ['rpmbuild', '-bb', '--quiet',
+             '--define', '_topdir %s' % topdir,
+             '--define', '_buildhost bench',
+             '--define', 'use_source_date_epoch_as_buildtime 1',
+             spec], env=env)
+        if not os.path.isdir(destdir):
+            os.makedirs(destdir)
+        for rpm in rpms:
+            shutil.move(os.path.join(topdir, 'RPMS', 'noarch', os.path.basename(rpm)),
+                        rpm)
+    finally:
+        shutil.rmtree(topdir)
+    return rpms
+
+
+def run(s3dir, rpms, args):
+    """Publish rpms with bin/rpm-s3; return the wall time, peak RSS (in KB)
+    and --timings report of the run."""
+    fd, timings = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        cmd = [sys.executable, RPM_S3, '-b', 'bench', '-c', 'file://' + s3dir,
+               '-p', 'synthetic', '--timings', timings] + args + rpms
+        start = time.time()
+        proc = subprocess.Popen(cmd)
+        pid, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.time() - start
+        if status != 0:
+            raise SystemExit('rpm-s3 failed: %s' % ' '.join(cmd[:12]))
+        report = json.load(open(timings))
+    finally:
+        os.unlink(timings)
+    # ru_maxrss is in KB on Linux
+    return wall, rusage.ru_maxrss, report
+
+
+def merge(total, wall, rss, report):
+    total['wall_seconds'] += wall
+    total['max_rss_kb'] = max(total['max_rss_kb'], rss)
+    for target in report['targets'].values():
+        for phase, seconds in target['phases'].items():
+            total['phases'][phase] = total['phases'].get(phase, 0) + seconds
+        for action, transfer in target['transfers'].items():
+            total['bytes'][action] = total['bytes'].get(action, 0) + transfer['bytes']
+
+
+def bench(rpms, chunk, args):
+    """Publish all but the last of rpms to an empty repository, in chunks
+    of at most chunk rpms (the command line can't take them all at once
+    for large sizes), then add the last one."""
+    s3dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for scenario, batches in (
+                ('populate', [rpms[i:i + chunk] for i in range(0, len(rpms) - 1, chunk)]),
+                ('add', [rpms[-1:]])):
+            total = {'wall_seconds': 0.0, 'max_rss_kb': 0, 'phases': {}, 'bytes': {},
+                     'runs': len(batches)}
+            for batch in batches:
+                merge(total, *run(s3dir, batch, args))
+            results[scenario] = total
+    finally:
+        shutil.rmtree(s3dir)
+    return results
+
+
+def git_version():
+    try:
+        proc = subprocess.Popen(['git', 'describe', '--always', '--dirty'],
+                                cwd=lib_root, stdout=subprocess.PIPE)
+        version = proc.communicate()[0].strip()
+        if proc.returncode == 0:
+            return version
+    except OSError:
+        pass
+    return 'unknown'
+
+
+def previous(results_file, entry):
+    """The last result of another version for the same benchmark."""
+    last = None
+    if results_file and os.path.exists(results_file):
+        for line in open(results_file):
+            old = json.loads(line)
+            if (old['version'] != entry['version'] and
+                    [old[k] for k in ('scenario', 'packages', 'files', 'args')] ==
+                    [entry[k] for k in ('scenario', 'packages', 'files', 'args')]):
+                last = old
+    return last
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [SIZE...] [-- RPM-S3 OPTIONS]')
+    parser.add_option('-f', '--files', type='int', default=20,
+                      help='files per synthetic package')
+    parser.add_option('--rpmdir', default=os.path.expanduser('~/.cache/rpm-s3-bench'),
+                      help='where the synthetic rpms are kept between runs')
+    parser.add_option('--chunk', type='int', default=2000,
+                      help='most rpms published per rpm-s3 run when populating')
+    parser.add_option('--results',
+                      help='append the results to this json lines file')
+    options, args = parser.parse_args()
+    if '--' in sys.argv:
+        extra = sys.argv[sys.argv.index('--') + 1:]
+        args = args[:len(args) - len(extra)]
+    else:
+        extra = []
+    sizes = [int(arg) for arg in args] or [1000, 10000]
+    version = git_version()
+
+    print '%-9s %8s %10s %10s %12s %12s' % ('scenario', 'packages', 'wall (s)',
+                                            'rss (MB)', 'up (MB)', 'down (MB)')
+    for count in sizes:
+        rpms = build_rpms(options.rpmdir, count + 1, options.files)
+        results = bench(rpms, options.chunk, extra)
+        for scenario in ('populate', 'add'):
+            entry = dict(results[scenario], version=version, date=time.time(),
+                         scenario=scenario, packages=count, files=options.files,
+                         args=extra)
+            print '%-9s %8d %10.2f %10.1f %12.1f %12.1f' % (
+                scenario, count, entry['wall_seconds'], entry['max_rss_kb'] / 1024.0,
+                entry['bytes'].get('upload', 0) / 1048576.0,
+                entry['bytes'].get('download', 0) / 1048576.0)
+            print '    ' + ', '.join('%s %.2fs' % (phase, seconds) for phase, seconds
+                                     in sorted(entry['phases'].items(),
+                                               key=lambda p: -p[1]))
+            last = previous(options.results, entry)
+            if last:
+                print '    was %.2fs, %.1f MB with %s' % (
+                    last['wall_seconds'], last['max_rss_kb'] / 1024.0, last['version'])
+            if options.results:
+                f = open(options.results, 'a')
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+                f.close()
+
+
+if __name__ == '__main__':
+    main()
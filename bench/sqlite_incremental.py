@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""Compare regenerating the sqlite databases of a repository with updating
+the previous ones (`rpm-s3 --incremental`) when a single package is added.
+Both must end up with the same packages and as many rows in each table.
+
+Synthetic repositories of 1k, 10k and 50k packages are generated by default.
+Needs the same environment as bin/rpm-s3 (yum, yum-metadata-parser, rpm):
+
+    python bench/sqlite_incremental.py [-f FILES_PER_PACKAGE] [SIZE...]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import optparse
+
+lib_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(lib_root, "vendor/createrepo"))
+import createrepo
+import sqlitecachec
+from yum import misc
+
+TEST_RPM = os.path.join(lib_root, "test",
+                        "blank-noop-app-1.0.0-20141120070739.x86_64.rpm")
+
+PRIMARY_PKG = """
+<package type="rpm">
+  <name>%(name)s</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="1.0" rel="1"/>
+  <checksum type="sha256" pkgid="YES">%(pkgid)s</checksum>
+  <summary>Synthetic package %(name)s</summary>
+  <description>Synthetic package %(name)s</description>
+  <packager></packager>
+  <url></url>
+  <time file="1416466059" build="1416466059"/>
+  <size package="1024" installed="4096" archive="4096"/>
+  <location href="%(name)s-1.0-1.x86_64.rpm"/>
+  <format>
+    <rpm:license>MIT</rpm:license>
+    <rpm:vendor></rpm:vendor>
+    <rpm:group>Applications/System</rpm:group>
+    <rpm:buildhost>localhost</rpm:buildhost>
+    <rpm:sourcerpm>%(name)s-1.0-1.src.rpm</rpm:sourcerpm>
+    <rpm:header-range start="280" end="1024"/>
+    <rpm:provides>
+      <rpm:entry name="%(name)s" flags="EQ" epoch="0" ver="1.0" rel="1"/>
+    </rpm:provides>
+    <rpm:requires>
+      <rpm:entry name="/bin/sh"/>
+    </rpm:requires>
+    <file>/usr/bin/%(name)s</file>
+  </format>
+</package>"""
+
+FILELISTS_PKG = """
+<package pkgid="%(pkgid)s" name="%(name)s" arch="x86_64">
+    <version epoch="0" ver="1.0" rel="1"/>
+%(files)s
+</package>"""
+
+OTHER_PKG = """
+<package pkgid="%(pkgid)s" name="%(name)s" arch="x86_64">
+    <version epoch="0" ver="1.0" rel="1"/>
+<changelog author="Bench &lt;bench@example.com&gt; - 1.0-1" date="1416466059">- release</changelog>
+</package>"""
+
+DOCS = [
+    ('primary', '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<metadata xmlns="http://linux.duke.edu/metadata/common"'
+                ' xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="%s">',
+     PRIMARY_PKG, '\n</metadata>'),
+    ('filelists', '<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<filelists xmlns="http://linux.duke.edu/metadata/filelists"'
+                  ' packages="%s">', FILELISTS_PKG, '\n</filelists>'),
+    ('other', '<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<otherdata xmlns="http://linux.duke.edu/metadata/other"'
+              ' packages="%s">', OTHER_PKG, '\n</otherdata>'),
+]
+
+
+def write_docs(destdir, count, files_per_pkg, extra=None):
+    """Write primary/filelists/other.xml.gz for count synthetic packages,
+    followed by the xml of the package object extra if given."""
+    paths = {}
+    total = count
+    if extra is not None:
+        total += 1
+    for ftype, header, template, footer in DOCS:
+        path = os.path.join(destdir, '%s.xml.gz' % ftype)
+        fo = createrepo.utils.compressOpen(path, 'w', 'gz')
+        fo.write(header % total)
+        for i in range(count):
+            name = 'synthetic-%06d' % i
+            files = '\n'.join('    <file>/usr/share/%s/file-%d</file>' % (name, n)
+                              for n in range(files_per_pkg))
+            fo.write(template % {'name': name, 'pkgid': '%064x' % i,
+                                 'files': files})
+        if extra is not None:
+            fo.write({'primary': extra.xml_dump_primary_metadata,
+                      'filelists': extra.xml_dump_filelists_metadata,
+                      'other': extra.xml_dump_other_metadata}[ftype]())
+        fo.write(footer)
+        fo.close()
+        paths[ftype] = (path, misc.checksum('sha256', path))
+    return paths
+
+
+def parse_dbs(destdir, paths):
+    """Generate sqlite databases from xml the way doRepoMetadata does."""
+    rp = sqlitecachec.RepodataParserSqlite(destdir, 'bench', None)
+    rp.getPrimary(*paths['primary'])
+    rp.getFilelists(*paths['filelists'])
+    rp.getOtherdata(*paths['other'])
+    dbs = {}
+    for ftype in ('primary', 'filelists', 'other'):
+        dbs[ftype] = os.path.join(destdir, '%s.sqlite' % ftype)
+        os.rename(os.path.join(destdir, '%s.xml.gz.sqlite' % ftype), dbs[ftype])
+    return dbs
+
+
+# tables whose rows both ways of building the databases must agree on
+TABLES = {
+    'primary': ('packages', 'files', 'requires', 'provides'),
+    'filelists': ('packages', 'filelist'),
+    'other': ('packages', 'changelog'),
+}
+
+
+def describe_dbs(dbs):
+    """The pkgIds and row counts of TABLES of dbs."""
+    description = {}
+    for ftype, tables in TABLES.items():
+        cx = sqlite3.connect(dbs[ftype])
+        description[ftype, 'pkgIds'] = sorted(
+            row[0] for row in cx.execute('SELECT pkgId FROM packages'))
+        for table in tables:
+            description[ftype, table] = cx.execute(
+                'SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+        cx.close()
+    return description
+
+
+def compare_dbs(full_dbs, incremental_dbs):
+    """Exit if the incremental databases don't hold what the full ones do."""
+    full = describe_dbs(full_dbs)
+    incremental = describe_dbs(incremental_dbs)
+    differences = []
+    for key in sorted(full):
+        if full[key] == incremental[key]:
+            continue
+        if key[1] == 'pkgIds':
+            differences.append('%s pkgIds: %d only in full, %d only in incremental' % (
+                key[0], len(set(full[key]) - set(incremental[key])),
+                len(set(incremental[key]) - set(full[key]))))
+        else:
+            differences.append('%s %s: %d rows in full, %d in incremental' % (
+                key[0], key[1], full[key], incremental[key]))
+    if differences:
+        raise SystemExit('incremental databases differ from the full ones:\n  ' +
+                         '\n  '.join(differences))
+
+
+def compress_dbs(dbs):
+    for path in dbs.values():
+        createrepo.utils.compressFile(path, path + '.bz2', 'bz2')
+
+
+def bench(count, files_per_pkg):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        old = os.path.join(tmpdir, 'old')
+        full = os.path.join(tmpdir, 'full')
+        incremental = os.path.join(tmpdir, 'incremental')
+        for d in (old, full, incremental):
+            os.mkdir(d)
+
+        conf = createrepo.MetaDataConfig()
+        conf.directory = incremental
+        conf.quiet = True
+        mdgen = createrepo.MetaDataGenerator(conf)
+        po = mdgen.read_in_package(os.path.basename(TEST_RPM),
+                                   pkgpath=os.path.dirname(TEST_RPM),
+                                   reldir=os.path.dirname(TEST_RPM))
+
+        old_dbs = parse_dbs(old, write_docs(old, count, files_per_pkg))
+        paths = write_docs(full, count, files_per_pkg, extra=po)
+
+        start = time.time()
+        full_dbs = parse_dbs(full, paths)
+        compress_dbs(full_dbs)
+        full_time = time.time() - start
+
+        conf.sqlite_from = old_dbs
+        conf.pkglist = [po]
+        start = time.time()
+        mdgen.update_sqlite_dbs(incremental)
+        dbs = {}
+        for ftype in ('primary', 'filelists', 'other'):
+            dbs[ftype] = os.path.join(incremental, '%s.sqlite' % ftype)
+            mdgen._set_sqlite_checksum(dbs[ftype], paths[ftype][1])
+        compress_dbs(dbs)
+        incremental_time = time.time() - start
+
+        compare_dbs(full_dbs, dbs)
+    finally:
+        shutil.rmtree(tmpdir)
+    return full_time, incremental_time
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [SIZE...]')
+    parser.add_option('-f', '--files', type='int', default=20,
+                      help='files per synthetic package')
+    options, args = parser.parse_args()
+    sizes = [int(arg) for arg in args] or [1000, 10000, 50000]
+
+    print '%10s %10s %12s %8s' % ('packages', 'full (s)', 'incremental', 'speedup')
+    for count in sizes:
+        full_time, incremental_time = bench(count, options.files)
+        print '%10d %10.2f %12.2f %7.1fx' % (count, full_time, incremental_time,
+                                             full_time / incremental_time)
+
+
+if __name__ == '__main__':
+    main()
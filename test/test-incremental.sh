@@ -0,0 +1,83 @@
+#!/bin/bash
+
+# Publish the same packages to two repositories of a filesystem-backed
+# bucket, one with and one without --incremental, and check that the
+# metadata is the same. A package built here is published first, so the
+# second run has to carry it over: from the previous documents when
+# splicing, from the sqlite databases when rebuilding. Needs rpmbuild.
+
+set -e
+
+DIR=$( cd "$( dirname "$0" )" && pwd )
+ROOT_DIR="$(dirname "$DIR")"
+TMPDIR=$(mktemp -d)
+trap "rm -rf $TMPDIR" EXIT
+
+cat > $TMPDIR/splice-test.spec <<EOF
+Name: splice-test
+Version: 1.0
+Release: 1
+Summary: Package for test-incremental.sh
+License: MIT
+BuildArch: noarch
+
+%description
+Package for test-incremental.sh
+
+%install
+mkdir -p %{buildroot}/usr/share/splice-test/b %{buildroot}/usr/bin
+touch %{buildroot}/usr/share/splice-test/a %{buildroot}/usr/share/splice-test/b/c
+touch %{buildroot}/usr/share/splice-test/d %{buildroot}/usr/bin/splice-test
+
+%files
+/usr/share/splice-test
+/usr/bin/splice-test
+
+%changelog
+* Thu Nov 20 2014 Test <test@example.com> - 1.0-1
+- Package for test-incremental.sh
+EOF
+rpmbuild -bb --quiet --define "_topdir $TMPDIR/rpmbuild" $TMPDIR/splice-test.spec
+OTHER_RPM=$(ls $TMPDIR/rpmbuild/RPMS/noarch/*.rpm)
+RPM=$(ls ${DIR}/*.rpm | head -n1)
+
+for MODE in full incremental; do
+  ARGS="-b test-bucket -v -c file://$TMPDIR/s3 -p $MODE"
+  if [ $MODE = incremental ]; then
+    ARGS="$ARGS --incremental"
+  fi
+  $ROOT_DIR/bin/rpm-s3 $ARGS $OTHER_RPM
+  $ROOT_DIR/bin/rpm-s3 $ARGS $RPM
+  for FTYPE in primary filelists other; do
+    zcat $TMPDIR/s3/test-bucket/$MODE/repodata/*-$FTYPE.xml.gz > $TMPDIR/$MODE-$FTYPE.xml
+  done
+done
+
+diff -u $TMPDIR/full-primary.xml $TMPDIR/incremental-primary.xml
+diff -u $TMPDIR/full-other.xml $TMPDIR/incremental-other.xml
+
+# A full rebuild lists the files of the packages it reads back from the
+# sqlite databases by directory, where splicing keeps the order of the
+# rpm (see --incremental in README.md): compare the files of each
+# package regardless of their order.
+sort_files() {
+  python -c '
+import sys
+run = []
+for line in open(sys.argv[1]):
+    if line.lstrip().startswith(("<file>", "<file ")):
+        run.append(line)
+        continue
+    sys.stdout.writelines(sorted(run))
+    run = []
+    sys.stdout.write(line)
+' $1
+}
+sort_files $TMPDIR/full-filelists.xml > $TMPDIR/full-filelists.sorted
+sort_files $TMPDIR/incremental-filelists.xml > $TMPDIR/incremental-filelists.sorted
+diff -u $TMPDIR/full-filelists.sorted $TMPDIR/incremental-filelists.sorted
+
+grep -q splice-test $TMPDIR/incremental-primary.xml
+grep -q blank-noop-app $TMPDIR/incremental-primary.xml
+
+echo "DONE"
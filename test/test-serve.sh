@@ -0,0 +1,72 @@
+#!/bin/bash
+
+# Publish and sign the test rpm through the --serve API to a
+# filesystem-backed bucket, with two concurrent requests that should
+# share one batch.
+
+set -e
+
+DIR=$( cd "$( dirname "$0" )" && pwd )
+ROOT_DIR="$(dirname "$DIR")"
+TMPDIR=$(mktemp -d)
+PORT=${PORT:=8642}
+
+cp -r ${DIR}/.gnupg $TMPDIR/
+chmod 0700 $TMPDIR/.gnupg
+cp ${DIR}/.rpmmacros $TMPDIR/
+# used to get .rpmmacros and .gnupg
+HOME="$TMPDIR"
+
+# signing rewrites the rpm, work on a copy
+RPM=$TMPDIR/$(basename $(ls ${DIR}/*.rpm | head -n1))
+cp $(ls ${DIR}/*.rpm | head -n1) $RPM
+
+$ROOT_DIR/bin/rpm-s3 -b test-bucket -v -l $TMPDIR/serve.log -c file://$TMPDIR/s3 \
+  --sign --serve 127.0.0.1:$PORT --batch-window 2 &
+SERVER=$!
+trap "kill $SERVER; rm -rf $TMPDIR" EXIT
+sleep 2
+
+PIDS=""
+for i in 1 2; do
+  curl -sf -d "{\"repopath\": \"centos6\", \"rpms\": [\"$RPM\"]}" http://127.0.0.1:$PORT/publish &
+  PIDS="$PIDS $!"
+done
+for PID in $PIDS; do
+  wait $PID
+done
+echo
+
+# both requests were published together, in one batch signing the rpm once
+curl -sf http://127.0.0.1:$PORT/metrics | tee $TMPDIR/metrics.json
+python -c '
+import sys, json
+metrics = json.load(open(sys.argv[1]))
+for name, value, expected in (
+        ("batches", metrics["batches"], 1),
+        ("failed_batches", metrics["failed_batches"], 0),
+        ("max_batch_size", metrics["max_batch_size"], 1),
+        ("last_batch requests", metrics["last_batch"]["requests"], 2)):
+    if value != expected:
+        sys.exit("%s is %s, expected %s" % (name, value, expected))
+' $TMPDIR/metrics.json
+
+ls $TMPDIR/s3/test-bucket/centos6 $TMPDIR/s3/test-bucket/centos6/repodata
+NAME=$(basename $RPM | sed 's/-[^-]*-[^-]*$//')
+if ! zcat $TMPDIR/s3/test-bucket/centos6/repodata/*-primary.xml.gz | grep -q "<name>$NAME</name>"; then
+  echo "$NAME is missing from the published primary.xml.gz"
+  exit 1
+fi
+
+# the rpm uploaded is the one the metadata describes
+zcat $TMPDIR/s3/test-bucket/centos6/repodata/*-primary.xml.gz > $TMPDIR/primary.xml
+python -c '
+import sys, re, hashlib
+primary = open(sys.argv[1]).read()
+pkgid = re.search(r"<checksum type=\"sha256\" pkgid=\"YES\">([^<]*)<", primary).group(1)
+uploaded = hashlib.sha256(open(sys.argv[2], "rb").read()).hexdigest()
+if pkgid != uploaded:
+    sys.exit("uploaded rpm is %s, primary.xml says %s" % (uploaded, pkgid))
+' $TMPDIR/primary.xml $TMPDIR/s3/test-bucket/centos6/$(basename $RPM)
+
+echo "DONE"